@@ -5,90 +5,425 @@ Implementa:
 - CRUD de pedidos (crear, listar, consultar por ID)
 - Autenticación por token JWT
 - Rate limiting por usuario
-- Reintentos automáticos ante fallos
+- Reintentos ante fallos (NGINX reintenta en otra réplica)
 - Replicación con Docker Compose
 """
 
 import os
+import re
+import hmac
+import json
 import time
 import logging
-import functools
+import threading
+import uuid
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
+import orjson
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_jwt_extended import (
     JWTManager, create_access_token, jwt_required, 
     get_jwt_identity, get_jwt
 )
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+import gevent
+from gevent.threadpool import ThreadPool
 import redis
-from werkzeug.security import generate_password_hash, check_password_hash
+from cachetools import TTLCache
+from pybloom_live import BloomFilter
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError
+from cryptography.hazmat.primitives import serialization
 
 # Configuración de logging
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    force=True
 )
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+# Literales de 20+ dígitos: posibles enteros fuera del rango de 64 bits de orjson
+WIDE_INT_PATTERN = re.compile(r'\d{20,}')
+WIDE_INT_PATTERN_BYTES = re.compile(rb'\d{20,}')
+
+def _parse_int64(literal: str) -> int:
+    value = int(literal)
+    if not -2 ** 63 <= value < 2 ** 64:
+        raise ValueError("Entero fuera del rango de 64 bits")
+    return value
+
+class OrjsonProvider(JSONProvider):
+    """
+    Serialización JSON con orjson (extensión en C) para jsonify y request.get_json()
+    """
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        # orjson convierte en float los enteros de más de 64 bits (pierde precisión):
+        # esos payloads se validan con json y se rechazan como JSON inválido
+        pattern = WIDE_INT_PATTERN if isinstance(s, str) else WIDE_INT_PATTERN_BYTES
+        if pattern.search(s):
+            return json.loads(s, parse_int=_parse_int64)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # orjson produce bytes: se entregan directamente sin pasar por str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+            mimetype='application/json'
+        )
+
+class OrdersApp(Flask):
+    json_provider_class = OrjsonProvider
+
+app = OrdersApp(__name__)
 
 # Configuración de la aplicación
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+app.config['JWT_ALGORITHM'] = 'HS256'
+app.config['JWT_DECODE_ALGORITHMS'] = ['HS256']
+
+# Firma asimétrica opcional con Ed25519: las claves PEM se cargan una sola vez como
+# objetos de clave para que PyJWT no vuelva a parsearlas en cada request
+if bool(os.getenv('JWT_PRIVATE_KEY_PATH')) != bool(os.getenv('JWT_PUBLIC_KEY_PATH')):
+    raise RuntimeError("JWT_PRIVATE_KEY_PATH y JWT_PUBLIC_KEY_PATH deben configurarse juntas")
+if os.getenv('JWT_PRIVATE_KEY_PATH'):
+    with open(os.getenv('JWT_PRIVATE_KEY_PATH'), 'rb') as key_file:
+        app.config['JWT_PRIVATE_KEY'] = serialization.load_pem_private_key(key_file.read(), password=None)
+    with open(os.getenv('JWT_PUBLIC_KEY_PATH'), 'rb') as key_file:
+        app.config['JWT_PUBLIC_KEY'] = serialization.load_pem_public_key(key_file.read())
+    app.config['JWT_ALGORITHM'] = 'EdDSA'
+    app.config['JWT_DECODE_ALGORITHMS'] = ['EdDSA']
 app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://redis:6379')
+app.config['REDIS_MAX_CONNECTIONS'] = int(os.getenv('REDIS_MAX_CONNECTIONS', 64))
+app.config['REDIS_POOL_TIMEOUT'] = float(os.getenv('REDIS_POOL_TIMEOUT', 5))
+app.config['REDIS_HEALTH_CHECK_INTERVAL'] = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))
+# Costo de argon2id (calibrar con scripts/calibrate_argon2.py)
+app.config['ARGON2_TIME_COST'] = int(os.getenv('ARGON2_TIME_COST', 3))
+app.config['ARGON2_MEMORY_COST'] = int(os.getenv('ARGON2_MEMORY_COST', 64 * 1024))
+app.config['ARGON2_PARALLELISM'] = int(os.getenv('ARGON2_PARALLELISM', 1))
+# Threads por worker para argon2: cada hash en curso reserva ARGON2_MEMORY_COST KiB
+app.config['PASSWORD_HASH_THREADS'] = int(os.getenv('PASSWORD_HASH_THREADS', 2))
+# Cache de credenciales verificadas (deshabilitado si no hay pepper en el entorno)
+app.config['AUTH_CACHE_PEPPER'] = os.getenv('AUTH_CACHE_PEPPER', '')
+app.config['AUTH_CACHE_TTL'] = int(os.getenv('AUTH_CACHE_TTL', 300))
+# Cache local de pedidos consultados (TTL corto: solo coalescer ráfagas)
+app.config['ORDER_CACHE_MAXSIZE'] = int(os.getenv('ORDER_CACHE_MAXSIZE', 10000))
+app.config['ORDER_CACHE_TTL'] = float(os.getenv('ORDER_CACHE_TTL', 2))
+# Segundos durante los que se reutiliza el resultado de /api/health
+app.config['HEALTH_CHECK_TTL'] = float(os.getenv('HEALTH_CHECK_TTL', 1))
+# Cantidad de order_id que cada worker reserva por round-trip a Redis (1 = INCR por pedido)
+app.config['ORDER_ID_BLOCK_SIZE'] = int(os.getenv('ORDER_ID_BLOCK_SIZE', 100))
+# Filtro bloom local de tokens invalidados (evita consultar Redis en cada request)
+app.config['REVOKED_FILTER_CAPACITY'] = int(os.getenv('REVOKED_FILTER_CAPACITY', 1000000))
+app.config['REVOKED_FILTER_ERROR_RATE'] = float(os.getenv('REVOKED_FILTER_ERROR_RATE', 0.001))
+# Segundos entre reconstrucciones del filtro (descarta los jti de tokens ya expirados)
+app.config['REVOKED_FILTER_REBUILD_INTERVAL'] = float(os.getenv('REVOKED_FILTER_REBUILD_INTERVAL', 3600))
 
 # Inicialización de extensiones
 jwt = JWTManager(app)
+password_hasher = PasswordHasher(
+    time_cost=app.config['ARGON2_TIME_COST'],
+    memory_cost=app.config['ARGON2_MEMORY_COST'],
+    parallelism=app.config['ARGON2_PARALLELISM']
+)
+# Threadpool propio y acotado: limita la memoria de argon2 por worker ante ráfagas de logins
+password_hash_pool = ThreadPool(maxsize=app.config['PASSWORD_HASH_THREADS'])
+
+# Configuración de Redis (estado compartido entre workers y réplicas)
+def create_redis_client() -> redis.Redis:
+    """
+    Crear un cliente Redis con su propio pool de conexiones.
+    Con gunicorn (sin preload) cada worker importa el módulo y obtiene su propio pool.
+    """
+    pool = redis.BlockingConnectionPool.from_url(
+        app.config['REDIS_URL'],
+        max_connections=app.config['REDIS_MAX_CONNECTIONS'],
+        timeout=app.config['REDIS_POOL_TIMEOUT'],
+        socket_keepalive=True,
+        health_check_interval=app.config['REDIS_HEALTH_CHECK_INTERVAL'],
+        decode_responses=True
+    )
+    return redis.Redis(connection_pool=pool)
 
-# Configuración de Redis para rate limiting
-try:
-    redis_client = redis.from_url(app.config['REDIS_URL'])
-    redis_client.ping()
-    logger.info("Conectado a Redis exitosamente")
-except Exception as e:
-    logger.warning(f"No se pudo conectar a Redis: {e}. Usando storage en memoria.")
-    redis_client = None
+# Las conexiones se abren de forma perezosa: no se comparte ningún socket a través del fork
+redis_client = create_redis_client()
 
 # Configuración del limitador de velocidad
 limiter = Limiter(
     app=app,
     key_func=lambda: get_jwt_identity() or get_remote_address(),
-    storage_uri=app.config['REDIS_URL'] if redis_client else "memory://",
+    storage_uri=app.config['REDIS_URL'],
+    in_memory_fallback_enabled=True,
     default_limits=["200 per day", "50 per hour"]
 )
 
-# Almacenamiento en memoria (en producción usar base de datos)
-users_db = {}  # {username: {password_hash, user_id}}
-orders_db = {}  # {order_id: order_data}
-blacklisted_tokens = set()  # Para invalidación de tokens
-order_counter = 0
-
-def retry_on_failure(max_retries=3, delay=1):
-    """
-    Decorador para reintentar operaciones que pueden fallar
-    """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    logger.warning(f"Intento {attempt + 1} falló: {str(e)}")
-                    if attempt == max_retries - 1:
-                        raise
-                    time.sleep(delay * (2 ** attempt))  # Backoff exponencial
-            return None
-        return wrapper
-    return decorator
+# Almacenamiento en Redis:
+#   users                 -> set de usernames
+#   user:<username>       -> hash {password_hash, user_id, created_at}
+#   users:counter         -> contador de user_id
+#   order:<order_id>      -> hash con los campos del pedido (valores JSON)
+#   orders:by_created     -> sorted set {order_id: timestamp de creación}
+#   orders:status:<st>    -> sorted set por status {order_id: timestamp de creación}
+#   orders:customer:<cn>  -> sorted set por cliente (nombre en minúsculas)
+#   orders:customers      -> set de nombres de cliente en minúsculas (búsqueda parcial)
+#   orders:counter        -> contador de order_id (reservado por bloques con INCRBY)
+#   stats:by_status       -> hash {status: cantidad de pedidos}
+#   stats:by_user         -> hash {username: cantidad de pedidos}
+#   stats:total_amount    -> suma de total_amount de todos los pedidos
+#   auth:revoked          -> sorted set {jti invalidado: exp del token}, se recorta al expirar
+#   auth:cache:<hmac>     -> credenciales verificadas recientemente (con TTL)
+#   auth:revoke           -> canal pub/sub con los jti invalidados
+
+# Constantes de pedidos (no se reconstruyen en cada request)
+ORDER_STATUSES = ('pending', 'processing', 'shipped', 'delivered', 'cancelled')
+VALID_STATUSES = frozenset(ORDER_STATUSES)
+REQUIRED_ORDER_FIELDS = ('customer_name', 'items', 'total_amount')
+ORDER_ID_FORMAT = "ORD-%06d"
+ORDER_KEY_PREFIX = "order:"
+
+# Búsqueda parcial por cliente resuelta en Redis en un solo round-trip: filtra
+# orders:customers, une los índices de los clientes coincidentes, intersecta con el
+# status si corresponde y devuelve {total, página}. La unión se hace por lotes para no
+# exceder el límite de argumentos de unpack; cada pedido pertenece a un único cliente,
+# así que los índices son disjuntos y el AGGREGATE por defecto no altera el score.
+# Las claves orders:customer:<cn> se construyen dentro del script, por lo que asume
+# una instancia de Redis única (no Redis Cluster).
+# KEYS: orders:customers, clave temporal, [orders:status:<st>]
+# ARGV: nombre buscado (minúsculas), inicio, fin (inclusive)
+CUSTOMER_QUERY_LUA = """
+local keys = {}
+for _, name in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    if string.find(name, ARGV[1], 1, true) then
+        keys[#keys + 1] = 'orders:customer:' .. name
+    end
+end
+if #keys == 0 then
+    return {0, {}}
+end
+for i = 1, #keys, 1000 do
+    local batch = {KEYS[2]}
+    for j = i, math.min(i + 999, #keys) do
+        batch[#batch + 1] = keys[j]
+    end
+    redis.call('ZUNIONSTORE', KEYS[2], #batch, unpack(batch))
+end
+if KEYS[3] then
+    redis.call('ZINTERSTORE', KEYS[2], 2, KEYS[2], KEYS[3], 'AGGREGATE', 'MAX')
+end
+local page = redis.call('ZREVRANGE', KEYS[2], ARGV[2], ARGV[3])
+local total = redis.call('ZCARD', KEYS[2])
+redis.call('DEL', KEYS[2])
+return {total, page}
+"""
+customer_query_script = redis_client.register_script(CUSTOMER_QUERY_LUA)
+
+# Cache por worker de pedidos leídos en get_order; update_order invalida la entrada local
+# y el TTL acota la lectura obsoleta en el resto de los workers
+order_cache = TTLCache(maxsize=app.config['ORDER_CACHE_MAXSIZE'], ttl=app.config['ORDER_CACHE_TTL'])
+order_cache_lock = threading.Lock()
+
+# Bloque de números de pedido reservado por este worker: [next, limit]
+order_number_block = {'next': 1, 'limit': 0}
+order_number_lock = threading.Lock()
+
+def allocate_order_number() -> int:
+    """
+    Obtener el siguiente número de pedido. INCRBY es atómico, por lo que cada worker
+    reserva un bloque propio sin colisiones; los números sin usar de un worker que
+    se reinicia quedan como huecos en la secuencia.
+    """
+    with order_number_lock:
+        if order_number_block['next'] <= order_number_block['limit']:
+            order_number = order_number_block['next']
+            order_number_block['next'] += 1
+            return order_number
+    
+    # El round-trip a Redis se hace sin el lock para no bloquear a otros greenlets
+    block_size = app.config['ORDER_ID_BLOCK_SIZE']
+    limit = redis_client.incrby("orders:counter", block_size)
+    order_number = limit - block_size + 1
+    
+    with order_number_lock:
+        # Si otro greenlet ya instaló un bloque nuevo, el resto de este queda como hueco
+        if order_number_block['next'] > order_number_block['limit']:
+            order_number_block['next'] = order_number + 1
+            order_number_block['limit'] = limit
+    return order_number
+
+def serialize_order(order: Dict) -> Dict[str, bytes]:
+    """Codificar los campos del pedido para guardarlos en un hash de Redis"""
+    return {field: orjson.dumps(value) for field, value in order.items()}
+
+def deserialize_order(raw: Dict[str, str]) -> Dict:
+    """Decodificar un hash de Redis a un pedido"""
+    return {field: orjson.loads(value) for field, value in raw.items()}
+
+def fetch_orders(order_ids: List[str]) -> List[Dict]:
+    """Obtener los pedidos indicados desde Redis en un solo round-trip, respetando el orden"""
+    if not order_ids:
+        return []
+    pipe = redis_client.pipeline(transaction=False)
+    for order_id in order_ids:
+        pipe.hgetall(ORDER_KEY_PREFIX + order_id)
+    return [deserialize_order(raw) for raw in pipe.execute() if raw]
+
+def query_order_ids(status: Optional[str], customer_name: Optional[str],
+                    start: int, end: int) -> Tuple[List[str], int]:
+    """
+    Resolver filtros y paginación con los índices secundarios de Redis.
+    Devuelve los order_id de la página (más recientes primero) y el total filtrado.
+    """
+    status_key = f"orders:status:{status}" if status else None
+    
+    if customer_name:
+        # Búsqueda parcial sobre los nombres de cliente, no sobre todos los pedidos
+        keys = ["orders:customers", f"orders:query:{uuid.uuid4().hex}"]
+        if status_key:
+            keys.append(status_key)
+        total, order_ids = customer_query_script(
+            keys=keys, args=[customer_name.lower(), start, end - 1], client=redis_client
+        )
+        return order_ids, total
+    
+    query_key = status_key or "orders:by_created"
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zrevrange(query_key, start, end - 1)
+    pipe.zcard(query_key)
+    order_ids, total = pipe.execute()
+    return order_ids, total
+
+def hash_password(password: str) -> str:
+    """Calcular el hash argon2id en password_hash_pool para no bloquear el hub del worker"""
+    return password_hash_pool.apply(password_hasher.hash, (password,))
+
+def _verify_password_blocking(password_hash: str, password: str) -> bool:
+    try:
+        return password_hasher.verify(password_hash, password)
+    except VerifyMismatchError:
+        return False
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """Verificar el password en password_hash_pool para no bloquear el hub del worker"""
+    return password_hash_pool.apply(_verify_password_blocking, (password_hash, password))
+
+def credential_cache_key(username: str, password_hash: str, password: str) -> Optional[str]:
+    """
+    Clave de cache para una verificación de password exitosa.
+    Incluye el hash almacenado, por lo que un cambio de password invalida las entradas previas.
+    """
+    pepper = app.config['AUTH_CACHE_PEPPER']
+    if not pepper:
+        return None
+    message = f"{username}:{password_hash}:{password}".encode()
+    return "auth:cache:" + hmac.new(pepper.encode(), message, 'sha256').hexdigest()
+
+# Filtro bloom por worker con los jti invalidados. Solo se usa como atajo mientras
+# revoked_filter_ready está activo (sincronizado con auth:revoked y suscrito a auth:revoke);
+# en cualquier otro caso se consulta Redis directamente. Un filtro bloom no admite bajas,
+# así que el listener lo reemplaza periódicamente (y en cuanto se llena) por uno nuevo
+# con los jti aún vigentes. Mientras se reconstruye, 'pending' acumula los jti que llegan
+# para agregarlos al filtro nuevo antes del reemplazo.
+def new_revoked_filter() -> BloomFilter:
+    """Crear un filtro vacío con la capacidad y la tasa de error configuradas"""
+    return BloomFilter(
+        capacity=app.config['REVOKED_FILTER_CAPACITY'],
+        error_rate=app.config['REVOKED_FILTER_ERROR_RATE']
+    )
+
+revoked_filter_state = {'filter': new_revoked_filter(), 'full': False, 'pending': None}
+revoked_filter_lock = threading.Lock()
+revoked_filter_ready = threading.Event()
+
+def add_revoked_token(jti: str):
+    """Agregar un jti al filtro local y a la reconstrucción en curso, si la hay"""
+    with revoked_filter_lock:
+        if revoked_filter_state['pending'] is not None:
+            revoked_filter_state['pending'].append(jti)
+        if revoked_filter_state['full']:
+            return
+        try:
+            revoked_filter_state['filter'].add(jti)
+        except IndexError:
+            logger.warning("Filtro de tokens invalidados lleno: se consulta Redis hasta reconstruirlo")
+            revoked_filter_state['full'] = True
+            revoked_filter_ready.clear()
+
+def rebuild_revoked_filter() -> bool:
+    """
+    Reemplazar el filtro por uno nuevo con los jti vigentes de auth:revoked.
+    Devuelve False si no entran en REVOKED_FILTER_CAPACITY; el filtro anterior
+    se mantiene (deshabilitado si ya estaba lleno).
+    """
+    with revoked_filter_lock:
+        revoked_filter_state['pending'] = []
+    try:
+        fresh = new_revoked_filter()
+        revoked = redis_client.zrangebyscore("auth:revoked", time.time(), '+inf')
+        for count, jti in enumerate(revoked, 1):
+            fresh.add(jti)
+            if count % 10000 == 0:
+                # Ceder el hub: un set grande no debe frenar las requests del worker
+                gevent.sleep(0)
+        with revoked_filter_lock:
+            for jti in revoked_filter_state['pending']:
+                fresh.add(jti)
+            revoked_filter_state['filter'] = fresh
+            revoked_filter_state['full'] = False
+            revoked_filter_ready.set()
+        return True
+    except IndexError:
+        logger.warning("Más tokens invalidados vigentes que REVOKED_FILTER_CAPACITY: se consulta Redis")
+        return False
+    finally:
+        with revoked_filter_lock:
+            revoked_filter_state['pending'] = None
+
+def listen_revoked_tokens():
+    """Mantener el filtro local sincronizado con los jti invalidados en cualquier réplica"""
+    interval = app.config['REVOKED_FILTER_REBUILD_INTERVAL']
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            # Suscribirse antes de cargar el set para no perder revocaciones intermedias
+            pubsub.subscribe("auth:revoke")
+            rebuilt = rebuild_revoked_filter()
+            next_rebuild = time.monotonic() + interval
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if message:
+                    add_revoked_token(message['data'])
+                # Si la última reconstrucción no entró, llenarse no adelanta la siguiente
+                if time.monotonic() >= next_rebuild or (rebuilt and revoked_filter_state['full']):
+                    rebuilt = rebuild_revoked_filter()
+                    next_rebuild = time.monotonic() + interval
+        except redis.exceptions.RedisError as e:
+            revoked_filter_ready.clear()
+            logger.warning("Suscripción a auth:revoke interrumpida: %s", e)
+            gevent.sleep(1)
+
+def start_revoked_tokens_listener():
+    """
+    Iniciar la sincronización del filtro en un greenlet. gunicorn lo invoca en
+    post_worker_init; con el servidor de desarrollo no se inicia y el filtro nunca
+    queda listo, por lo que cada verificación consulta Redis.
+    """
+    gevent.spawn(listen_revoked_tokens)
 
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(jwt_header, jwt_payload):
     """Verificar si el token JWT está en la lista negra"""
-    return jwt_payload['jti'] in blacklisted_tokens
+    jti = jwt_payload['jti']
+    if revoked_filter_ready.is_set() and jti not in revoked_filter_state['filter']:
+        return False
+    return redis_client.zscore("auth:revoked", jti) is not None
 
 # ============ ENDPOINTS DE AUTENTICACIÓN ============
 
@@ -107,29 +442,37 @@ def register():
         username = data['username']
         password = data['password']
         
-        if username in users_db:
-            return jsonify({'error': 'Usuario ya existe'}), 409
-        
         # Validación básica de password
         if len(password) < 6:
             return jsonify({'error': 'Password debe tener al menos 6 caracteres'}), 400
         
-        # Crear usuario
-        user_id = len(users_db) + 1
-        users_db[username] = {
-            'password_hash': generate_password_hash(password),
-            'user_id': user_id,
-            'created_at': datetime.utcnow().isoformat()
-        }
+        # El hash se calcula antes de reservar el username para no dejarlo tomado si falla
+        password_hash = hash_password(password)
+        
+        # SADD es atómico: solo un worker puede reservar el username
+        if not redis_client.sadd("users", username):
+            return jsonify({'error': 'Usuario ya existe'}), 409
         
-        logger.info(f"Usuario registrado: {username}")
+        # Crear usuario; si falla se libera el username reservado
+        try:
+            user_id = redis_client.incr("users:counter")
+            redis_client.hset(f"user:{username}", mapping={
+                'password_hash': password_hash,
+                'user_id': user_id,
+                'created_at': datetime.utcnow().isoformat()
+            })
+        except Exception:
+            redis_client.srem("users", username)
+            raise
+        
+        logger.info("Usuario registrado: %s", username)
         return jsonify({
             'message': 'Usuario registrado exitosamente',
             'user_id': user_id
         }), 201
         
     except Exception as e:
-        logger.error(f"Error en registro: {str(e)}")
+        logger.error("Error en registro: %s", e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 @app.route('/api/login', methods=['POST'])
@@ -147,25 +490,40 @@ def login():
         username = data['username']
         password = data['password']
         
-        if username not in users_db:
+        user = redis_client.hgetall(f"user:{username}")
+        if not user:
             return jsonify({'error': 'Credenciales inválidas'}), 401
         
-        user = users_db[username]
-        if not check_password_hash(user['password_hash'], password):
-            return jsonify({'error': 'Credenciales inválidas'}), 401
+        password_hash = user['password_hash']
+        cache_key = credential_cache_key(username, password_hash, password)
+        cached = redis_client.get(cache_key) if cache_key else None
+        
+        # Solo se ejecuta argon2 si la credencial no fue verificada recientemente
+        if not hmac.compare_digest(cached or "", "1"):
+            if not verify_password(password_hash, password):
+                return jsonify({'error': 'Credenciales inválidas'}), 401
+            
+            # Re-hashear si los parámetros de costo cambiaron tras una recalibración
+            if password_hasher.check_needs_rehash(password_hash):
+                password_hash = hash_password(password)
+                redis_client.hset(f"user:{username}", 'password_hash', password_hash)
+                cache_key = credential_cache_key(username, password_hash, password)
+            
+            if cache_key:
+                redis_client.setex(cache_key, app.config['AUTH_CACHE_TTL'], "1")
         
         # Crear token JWT
         access_token = create_access_token(identity=username)
         
-        logger.info(f"Login exitoso: {username}")
+        logger.info("Login exitoso: %s", username)
         return jsonify({
             'access_token': access_token,
-            'user_id': user['user_id'],
+            'user_id': int(user['user_id']),
             'expires_in': app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
         }), 200
         
     except Exception as e:
-        logger.error(f"Error en login: {str(e)}")
+        logger.error("Error en login: %s", e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 @app.route('/api/logout', methods=['POST'])
@@ -175,15 +533,22 @@ def logout():
     Cerrar sesión e invalidar token
     """
     try:
-        jti = get_jwt()['jti']
-        blacklisted_tokens.add(jti)
+        claims = get_jwt()
+        jti = claims['jti']
+        pipe = redis_client.pipeline()
+        # Solo se conservan los jti de tokens que todavía no expiraron
+        pipe.zremrangebyscore("auth:revoked", '-inf', time.time())
+        pipe.zadd("auth:revoked", {jti: claims['exp']})
+        pipe.publish("auth:revoke", jti)
+        pipe.execute()
+        add_revoked_token(jti)
         
         username = get_jwt_identity()
-        logger.info(f"Logout exitoso: {username}")
+        logger.info("Logout exitoso: %s", username)
         return jsonify({'message': 'Logout exitoso'}), 200
         
     except Exception as e:
-        logger.error(f"Error en logout: {str(e)}")
+        logger.error("Error en logout: %s", e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 # ============ ENDPOINTS DE PEDIDOS ============
@@ -191,20 +556,16 @@ def logout():
 @app.route('/api/orders', methods=['POST'])
 @jwt_required()
 @limiter.limit("30 per minute")
-@retry_on_failure(max_retries=3)
 def create_order():
     """
     Crear un nuevo pedido
     """
     try:
-        global order_counter
-        
         data = request.get_json()
         username = get_jwt_identity()
         
         # Validación de datos requeridos
-        required_fields = ['customer_name', 'items', 'total_amount']
-        if not data or not all(field in data for field in required_fields):
+        if not data or not all(field in data for field in REQUIRED_ORDER_FIELDS):
             return jsonify({'error': 'Campos requeridos: customer_name, items, total_amount'}), 400
         
         if not isinstance(data['items'], list) or len(data['items']) == 0:
@@ -214,9 +575,10 @@ def create_order():
             return jsonify({'error': 'Total amount debe ser un número positivo'}), 400
         
         # Crear pedido
-        order_counter += 1
-        order_id = f"ORD-{order_counter:06d}"
+        order_id = ORDER_ID_FORMAT % allocate_order_number()
         
+        # Un único timestamp para created_at y updated_at
+        now_iso = datetime.utcnow().isoformat()
         order = {
             'order_id': order_id,
             'customer_name': data['customer_name'],
@@ -224,8 +586,8 @@ def create_order():
             'total_amount': float(data['total_amount']),
             'status': 'pending',
             'created_by': username,
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
+            'created_at': now_iso,
+            'updated_at': now_iso
         }
         
         # Agregar campos opcionales
@@ -234,22 +596,34 @@ def create_order():
         if 'notes' in data:
             order['notes'] = data['notes']
         
-        orders_db[order_id] = order
-        
-        logger.info(f"Pedido creado: {order_id} por usuario {username}")
+        created_score = time.time()
+        customer_key = str(order['customer_name']).lower()
+        pipe = redis_client.pipeline()
+        pipe.hset(ORDER_KEY_PREFIX + order_id, mapping=serialize_order(order))
+        pipe.zadd("orders:by_created", {order_id: created_score})
+        # Índices secundarios para los filtros de list_orders
+        pipe.zadd(f"orders:status:{order['status']}", {order_id: created_score})
+        pipe.zadd(f"orders:customer:{customer_key}", {order_id: created_score})
+        pipe.sadd("orders:customers", customer_key)
+        # Contadores incrementales para /api/stats
+        pipe.hincrby("stats:by_status", order['status'], 1)
+        pipe.hincrby("stats:by_user", username, 1)
+        pipe.incrbyfloat("stats:total_amount", order['total_amount'])
+        pipe.execute()
+        
+        logger.info("Pedido creado: %s por usuario %s", order_id, username)
         return jsonify({
             'message': 'Pedido creado exitosamente',
             'order': order
         }), 201
         
     except Exception as e:
-        logger.error(f"Error creando pedido: {str(e)}")
+        logger.error("Error creando pedido: %s", e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 @app.route('/api/orders', methods=['GET'])
 @jwt_required()
 @limiter.limit("100 per minute")
-@retry_on_failure(max_retries=3)
 def list_orders():
     """
     Listar pedidos con paginación y filtros
@@ -263,31 +637,19 @@ def list_orders():
         status = request.args.get('status')
         customer_name = request.args.get('customer_name')
         
-        # Filtrar pedidos
-        filtered_orders = []
-        for order in orders_db.values():
-            # Filtro por estado
-            if status and order['status'] != status:
-                continue
-            
-            # Filtro por nombre de cliente (búsqueda parcial)
-            if customer_name and customer_name.lower() not in order['customer_name'].lower():
-                continue
-            
-            filtered_orders.append(order)
+        if page < 1 or per_page < 1:
+            raise ValueError("Parámetros de paginación fuera de rango")
         
-        # Ordenar por fecha de creación (más recientes primero)
-        filtered_orders.sort(key=lambda x: x['created_at'], reverse=True)
-        
-        # Paginación
         start_idx = (page - 1) * per_page
         end_idx = start_idx + per_page
-        paginated_orders = filtered_orders[start_idx:end_idx]
         
-        total_orders = len(filtered_orders)
+        # Filtros y paginación se resuelven en Redis (más recientes primero)
+        order_ids, total_orders = query_order_ids(status, customer_name, start_idx, end_idx)
+        paginated_orders = fetch_orders(order_ids)
+        
         total_pages = (total_orders + per_page - 1) // per_page
         
-        logger.info(f"Lista de pedidos consultada por {username}: {len(paginated_orders)} resultados")
+        logger.debug("Lista de pedidos consultada por %s: %s resultados", username, len(paginated_orders))
         return jsonify({
             'orders': paginated_orders,
             'pagination': {
@@ -303,13 +665,12 @@ def list_orders():
     except ValueError:
         return jsonify({'error': 'Parámetros de paginación inválidos'}), 400
     except Exception as e:
-        logger.error(f"Error listando pedidos: {str(e)}")
+        logger.error("Error listando pedidos: %s", e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 @app.route('/api/orders/<order_id>', methods=['GET'])
 @jwt_required()
 @limiter.limit("200 per minute")
-@retry_on_failure(max_retries=3)
 def get_order(order_id):
     """
     Consultar pedido por ID
@@ -317,22 +678,37 @@ def get_order(order_id):
     try:
         username = get_jwt_identity()
         
-        if order_id not in orders_db:
-            return jsonify({'error': 'Pedido no encontrado'}), 404
+        with order_cache_lock:
+            order = order_cache.get(order_id)
         
-        order = orders_db[order_id]
+        if order is None:
+            raw = redis_client.hgetall(ORDER_KEY_PREFIX + order_id)
+            if not raw:
+                return jsonify({'error': 'Pedido no encontrado'}), 404
+            
+            order = deserialize_order(raw)
+            with order_cache_lock:
+                order_cache[order_id] = order
+        
+        # updated_at cambia en cada modificación: sirve como ETag del pedido
+        etag = order['updated_at']
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            logger.debug("Pedido consultado: %s por usuario %s", order_id, username)
+            response = jsonify({'order': order})
         
-        logger.info(f"Pedido consultado: {order_id} por usuario {username}")
-        return jsonify({'order': order}), 200
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        return response
         
     except Exception as e:
-        logger.error(f"Error consultando pedido {order_id}: {str(e)}")
+        logger.error("Error consultando pedido %s: %s", order_id, e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 @app.route('/api/orders/<order_id>', methods=['PUT'])
 @jwt_required()
 @limiter.limit("20 per minute")
-@retry_on_failure(max_retries=3)
 def update_order(order_id):
     """
     Actualizar estado del pedido
@@ -341,62 +717,93 @@ def update_order(order_id):
         username = get_jwt_identity()
         data = request.get_json()
         
-        if order_id not in orders_db:
+        if not redis_client.exists(ORDER_KEY_PREFIX + order_id):
             return jsonify({'error': 'Pedido no encontrado'}), 404
         
         if not data or 'status' not in data:
             return jsonify({'error': 'Status es requerido'}), 400
         
-        valid_statuses = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
-        if data['status'] not in valid_statuses:
-            return jsonify({'error': f'Status inválido. Valores válidos: {valid_statuses}'}), 400
-        
-        order = orders_db[order_id]
-        order['status'] = data['status']
-        order['updated_at'] = datetime.utcnow().isoformat()
-        
-        logger.info(f"Pedido actualizado: {order_id} por usuario {username}")
+        if data['status'] not in VALID_STATUSES:
+            return jsonify({'error': f'Status inválido. Valores válidos: {list(ORDER_STATUSES)}'}), 400
+        
+        order_key = ORDER_KEY_PREFIX + order_id
+        new_status = data['status']
+        
+        def apply_update(pipe):
+            # WATCH sobre el pedido: si otro worker cambia el status se reintenta
+            old_status = orjson.loads(pipe.hget(order_key, 'status'))
+            created_score = pipe.zscore("orders:by_created", order_id)
+            pipe.multi()
+            pipe.hset(order_key, mapping=serialize_order({
+                'status': new_status,
+                'updated_at': datetime.utcnow().isoformat()
+            }))
+            if old_status != new_status:
+                pipe.hincrby("stats:by_status", old_status, -1)
+                pipe.hincrby("stats:by_status", new_status, 1)
+                pipe.zrem(f"orders:status:{old_status}", order_id)
+                pipe.zadd(f"orders:status:{new_status}", {order_id: created_score})
+            pipe.hgetall(order_key)
+        
+        results = redis_client.transaction(apply_update, order_key)
+        order = deserialize_order(results[-1])
+        with order_cache_lock:
+            order_cache.pop(order_id, None)
+        
+        logger.info("Pedido actualizado: %s por usuario %s", order_id, username)
         return jsonify({
             'message': 'Pedido actualizado exitosamente',
             'order': order
         }), 200
         
     except Exception as e:
-        logger.error(f"Error actualizando pedido {order_id}: {str(e)}")
+        logger.error("Error actualizando pedido %s: %s", order_id, e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 # ============ ENDPOINTS DE SISTEMA ============
 
+# Último resultado del health check: los balanceadores lo consultan con alta frecuencia
+# y no necesitan más frescura que HEALTH_CHECK_TTL
+health_snapshot = {'checked_at': float('-inf'), 'body': None, 'status_code': 503}
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """
     Verificación de salud del servicio
     """
-    try:
-        # Verificar conexión a Redis
-        redis_status = "connected"
-        if redis_client:
-            redis_client.ping()
-        else:
-            redis_status = "not_connected"
-        
-        return jsonify({
-            'status': 'healthy',
-            'timestamp': datetime.utcnow().isoformat(),
-            'version': '1.0.0',
-            'services': {
-                'redis': redis_status,
-                'orders_count': len(orders_db),
-                'users_count': len(users_db)
+    now = time.monotonic()
+    if now - health_snapshot['checked_at'] >= app.config['HEALTH_CHECK_TTL']:
+        try:
+            # Verificar conexión a Redis y leer contadores en un solo round-trip
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.ping()
+            pipe.zcard("orders:by_created")
+            pipe.scard("users")
+            _, orders_count, users_count = pipe.execute()
+            
+            body = {
+                'status': 'healthy',
+                'timestamp': datetime.utcnow().isoformat(),
+                'version': '1.0.0',
+                'services': {
+                    'redis': "connected",
+                    'orders_count': orders_count,
+                    'users_count': users_count
+                }
             }
-        }), 200
+            status_code = 200
+            
+        except Exception as e:
+            logger.error("Error en health check: %s", e)
+            body = {
+                'status': 'unhealthy',
+                'error': str(e)
+            }
+            status_code = 503
         
-    except Exception as e:
-        logger.error(f"Error en health check: {str(e)}")
-        return jsonify({
-            'status': 'unhealthy',
-            'error': str(e)
-        }), 503
+        health_snapshot.update(checked_at=now, body=body, status_code=status_code)
+    
+    return jsonify(health_snapshot['body']), health_snapshot['status_code']
 
 @app.route('/api/stats', methods=['GET'])
 @jwt_required()
@@ -408,38 +815,43 @@ def get_stats():
     try:
         username = get_jwt_identity()
         
-        # Calcular estadísticas
-        status_counts = {}
-        user_orders = {}
-        total_amount = 0
+        # Leer los contadores mantenidos en create_order/update_order
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zcard("orders:by_created")
+        pipe.scard("users")
+        pipe.get("stats:total_amount")
+        pipe.hgetall("stats:by_status")
+        pipe.hgetall("stats:by_user")
+        total_orders, total_users, total_amount, by_status, by_user = pipe.execute()
         
-        for order in orders_db.values():
-            # Contar por status
-            status = order['status']
-            status_counts[status] = status_counts.get(status, 0) + 1
-            
-            # Contar por usuario
-            creator = order['created_by']
-            user_orders[creator] = user_orders.get(creator, 0) + 1
-            
-            # Sumar amounts
-            total_amount += order['total_amount']
+        status_counts = {status: int(count) for status, count in by_status.items() if int(count) > 0}
+        user_orders = {user: int(count) for user, count in by_user.items()}
         
-        logger.info(f"Estadísticas consultadas por {username}")
+        logger.info("Estadísticas consultadas por %s", username)
         return jsonify({
-            'total_orders': len(orders_db),
-            'total_users': len(users_db),
-            'total_amount': round(total_amount, 2),
+            'total_orders': total_orders,
+            'total_users': total_users,
+            'total_amount': round(float(total_amount or 0), 2),
             'orders_by_status': status_counts,
             'orders_by_user': user_orders
         }), 200
         
     except Exception as e:
-        logger.error(f"Error obteniendo estadísticas: {str(e)}")
+        logger.error("Error obteniendo estadísticas: %s", e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 # ============ MANEJO DE ERRORES ============
 
+@app.before_request
+def parse_json_body():
+    """Parsear el body JSON antes de la vista para responder 400 si es inválido"""
+    if request.is_json and request.content_length:
+        request.get_json()
+
+@app.errorhandler(400)
+def bad_request(error):
+    return jsonify({'error': 'Solicitud inválida'}), 400
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint no encontrado'}), 404
@@ -461,5 +873,9 @@ if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') == 'development'
     
-    logger.info(f"Iniciando servidor en puerto {port}")
-    app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
+    if not debug:
+        # En producción el servidor de desarrollo de Werkzeug es un cuello de botella
+        print("Ejecutar con gunicorn (configuración en gunicorn.conf.py): gunicorn app:app")
+    else:
+        logger.info("Iniciando servidor de desarrollo en puerto %s", port)
+        app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
@@ -240,7 +240,6 @@ curl -X GET ${API_URL}/orders \
 
 # Los reintentos están configurados automáticamente en:
 # - NGINX: proxy_next_upstream para fallos de instancias
-# - Flask app: @retry_on_failure decorator en endpoints críticos
 # - Docker Compose: restart policies para recuperación automática
 
 # Para simular fallos, puedes parar una instancia:
@@ -282,7 +281,6 @@ done
 
 # 4. Reintentos:
 #    - NGINX: 3 reintentos con timeout de 10s
-#    - App: @retry_on_failure con backoff exponencial
 #    - Docker: restart unless-stopped
 
 # 5. Monitoreo:
@@ -0,0 +1,29 @@
+"""
+Configuración de gunicorn para la API de pedidos
+Workers gevent (I/O-bound) y un cliente Redis propio por worker
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+worker_class = "gevent"
+workers = int(os.getenv('GUNICORN_WORKERS', 2 * multiprocessing.cpu_count() + 1))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+# Sin preload cada worker importa app.py después del fork y del monkey-patching de gevent:
+# el pool de Redis y los locks del módulo son propios del worker y cooperativos
+preload_app = False
+
+
+def post_worker_init(worker):
+    """
+    Se ejecuta en el worker después del monkey-patching y de cargar la aplicación
+    e inicia la sincronización del filtro de tokens invalidados
+    """
+    import app as orders_app
+    from redis.utils import HIREDIS_AVAILABLE
+
+    orders_app.start_revoked_tokens_listener()
+    worker.log.info(
+        "Worker %s: listener de tokens invalidados iniciado (parser hiredis: %s)", worker.pid, HIREDIS_AVAILABLE
+    )
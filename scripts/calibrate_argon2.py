@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Calibración de los parámetros de argon2id para el host de despliegue
+
+Aumenta time_cost hasta que una verificación tarde al menos el objetivo
+(300 ms por defecto) y muestra las variables de entorno a configurar.
+
+Uso: python3 scripts/calibrate_argon2.py [objetivo_ms] [memory_cost_kib]
+"""
+
+import sys
+import time
+
+from argon2 import PasswordHasher
+
+SAMPLE_PASSWORD = "calibration-password"
+SAMPLES = 5
+MAX_TIME_COST = 64
+
+
+def measure_verify_ms(hasher: PasswordHasher) -> float:
+    """Tiempo medio (ms) de una verificación con los parámetros dados"""
+    password_hash = hasher.hash(SAMPLE_PASSWORD)
+    start = time.perf_counter()
+    for _ in range(SAMPLES):
+        hasher.verify(password_hash, SAMPLE_PASSWORD)
+    return (time.perf_counter() - start) * 1000 / SAMPLES
+
+
+def main():
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 300.0
+    memory_cost = int(sys.argv[2]) if len(sys.argv) > 2 else 64 * 1024
+
+    for time_cost in range(1, MAX_TIME_COST + 1):
+        hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=1)
+        elapsed_ms = measure_verify_ms(hasher)
+        print(f"time_cost={time_cost:<3} memory_cost={memory_cost} KiB -> {elapsed_ms:.1f} ms")
+        if elapsed_ms >= target_ms:
+            break
+
+    print()
+    print(f"# Objetivo: {target_ms:.0f} ms por verificación ({elapsed_ms:.1f} ms obtenidos)")
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_cost}")
+    print("ARGON2_PARALLELISM=1")
+
+
+if __name__ == '__main__':
+    main()
@@ -43,6 +43,7 @@ validate_files() {
     
     local files=(
         "app.py"
+        "gunicorn.conf.py"
         "requirements.txt"
         "Dockerfile"
         "docker-compose.yml"